@@ -1,12 +1,123 @@
 import streamlit as st
 import asyncio
+import atexit
+import mmap
 import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
 from dotenv import load_dotenv
+from chat import close_chat_manager
 from multi_agent_system import run_multi_agent
+from response_cache import ResponseCache
+
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
 
 # Load environment variables
 load_dotenv()
 
+# Larger generated files are truncated in the on-page preview
+HTML_PREVIEW_BYTES = 64 * 1024
+
+REQUIRED_VARS = frozenset({
+    "AZURE_OPENAI_API_KEY",
+    "AZURE_OPENAI_ENDPOINT",
+    "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"
+})
+
+@st.cache_resource
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Start the event loop the agent pipeline runs on, shared across reruns.
+    
+    Keeping one loop alive in a background thread lets async clients and their
+    connection pools persist between button clicks. uvloop is used when
+    available, without replacing the process-wide policy Streamlit runs on.
+    """
+    loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="agent-event-loop", daemon=True).start()
+    atexit.register(close_agent_loop, loop)
+    return loop
+
+def close_agent_loop(loop: asyncio.AbstractEventLoop):
+    """Flush the shared chat manager on the loop that owns it before exiting."""
+    asyncio.run_coroutine_threadsafe(close_chat_manager(), loop).result(timeout=10)
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Load the semantic response cache once per process."""
+    return ResponseCache()
+
+@dataclass
+class ProgressEvent:
+    """A progress update streamed from the agent pipeline to the UI."""
+    pct: int
+    text: str
+    history: Optional[List] = None
+
+async def run_multi_agent_stream(user_input: str, cache: Optional[ResponseCache] = None) -> AsyncIterator[ProgressEvent]:
+    """Run the multi-agent system, yielding progress events while it works.
+    
+    When a near-duplicate prompt is found in the response cache, the cached
+    history and HTML are returned without running the agents.
+    """
+    yield ProgressEvent(10, "Initializing agents...")
+    
+    embedding = await cache.embed(user_input) if cache else None
+    cached = cache.lookup(embedding) if cache else None
+    if cached is not None:
+        if cached.html is not None:
+            with open('index.html', 'w', encoding='utf-8') as f:
+                f.write(cached.html)
+        elif os.path.exists('index.html'):
+            # Don't show an earlier run's output as this run's
+            os.remove('index.html')
+        yield ProgressEvent(100, "Complete! (cached)", history=cached.history)
+        return
+    
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    started_at = time.time()
+    task = asyncio.ensure_future(run_multi_agent(user_input))
+    
+    while not task.done():
+        elapsed = loop.time() - started
+        yield ProgressEvent(30, f"Agents are collaborating on your request... ({elapsed:.0f}s)")
+        await asyncio.wait({task}, timeout=1)
+    
+    history = task.result()
+    if cache:
+        # Only cache HTML written by this run, not a leftover from an earlier one
+        html = None
+        if os.path.exists('index.html') and os.path.getmtime('index.html') >= started_at:
+            with open('index.html', 'r', encoding='utf-8') as f:
+                html = f.read()
+        cache.add(embedding, history, html)
+    
+    yield ProgressEvent(100, "Complete!", history=history)
+
+async def stream_to_queue(user_input: str, events: queue.Queue, cache: Optional[ResponseCache] = None):
+    """Forward progress events from the agent pipeline to a thread-safe queue."""
+    async for event in run_multi_agent_stream(user_input, cache):
+        events.put(event)
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_html(path: str, mtime: float, size: int) -> bytes:
+    """Read a generated HTML file as raw bytes.
+    
+    mtime and size are part of the cache key so the file is only re-read when
+    it actually changes; only the current file is kept.
+    """
+    if size == 0:
+        return b""
+    
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return bytes(mm)
+
 def main():
     st.title("Multi-Agent System - Web App Generator")
     st.write("Welcome to the Multi-Agent System that creates web applications!")
@@ -14,19 +125,17 @@ def main():
     # Sidebar for configuration
     st.sidebar.title("Configuration")
     st.sidebar.write("Make sure your Azure OpenAI credentials are configured in the .env file")
+    st.sidebar.write(f"Agent concurrency: {os.environ.get('AGENT_CONCURRENCY', '4')} (set AGENT_CONCURRENCY in the .env file)")
     
-    # Check if environment variables are set
-    required_vars = [
-        "AZURE_OPENAI_API_KEY",
-        "AZURE_OPENAI_ENDPOINT", 
-        "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"
-    ]
-    
-    missing_vars = [var for var in required_vars if not os.environ.get(var)]
-    
-    if missing_vars:
-        st.error(f"Missing environment variables: {', '.join(missing_vars)}")
-        st.stop()
+    # Check if environment variables are set (once per session)
+    if not st.session_state.get("env_validated"):
+        missing_vars = {var for var in REQUIRED_VARS if not os.environ.get(var)}
+        
+        if missing_vars:
+            st.error(f"Missing environment variables: {', '.join(sorted(missing_vars))}")
+            st.stop()
+        
+        st.session_state.env_validated = True
     
     # Main interface
     st.header("Project Requirements")
@@ -48,27 +157,27 @@ def main():
             status_text = st.empty()
             
             try:
-                # Run the multi-agent system
-                status_text.text("Initializing agents...")
-                progress_bar.progress(10)
+                # Run the multi-agent system on the persistent event loop and
+                # update the UI as progress events arrive
+                events = queue.Queue()
+                future = asyncio.run_coroutine_threadsafe(
+                    stream_to_queue(user_input, events, get_response_cache()), get_event_loop()
+                )
                 
-                status_text.text("Business Analyst analyzing requirements...")
-                progress_bar.progress(30)
-                
-                # Run the async function
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                
-                status_text.text("Software Engineer coding the application...")
-                progress_bar.progress(60)
-                
-                history = loop.run_until_complete(run_multi_agent(user_input))
-                
-                status_text.text("Product Owner reviewing the code...")
-                progress_bar.progress(90)
-                
-                progress_bar.progress(100)
-                status_text.text("Complete!")
+                history = []
+                while True:
+                    try:
+                        event = events.get(timeout=0.1)
+                    except queue.Empty:
+                        if future.done():
+                            future.result()  # Re-raise pipeline errors
+                            break
+                        continue
+                    
+                    status_text.text(event.text)
+                    progress_bar.progress(event.pct)
+                    if event.history is not None:
+                        history = event.history
                 
                 st.success("Multi-agent system has completed the task!")
                 
@@ -83,16 +192,19 @@ def main():
                     st.success("✅ HTML file generated successfully!")
                     
                     # Show HTML preview
-                    with open('index.html', 'r', encoding='utf-8') as f:
-                        html_content = f.read()
+                    stat = os.stat('index.html')
+                    html_bytes = load_html('index.html', stat.st_mtime, stat.st_size)
                     
                     st.header("Generated HTML Code")
-                    st.code(html_content, language='html')
+                    # Highlighting a multi-megabyte file stalls the page, so only preview the start
+                    st.code(html_bytes[:HTML_PREVIEW_BYTES].decode('utf-8', errors='ignore'), language='html')
+                    if len(html_bytes) > HTML_PREVIEW_BYTES:
+                        st.caption(f"Showing the first {HTML_PREVIEW_BYTES // 1024} KB of {len(html_bytes) // 1024} KB. Download the file for the full source.")
                     
                     # Download button
                     st.download_button(
                         label="Download HTML File",
-                        data=html_content,
+                        data=html_bytes,
                         file_name="index.html",
                         mime="text/html"
                     )
@@ -102,8 +214,6 @@ def main():
                         st.info("📁 GitHub push script created: push_to_github.sh")
                         st.code("chmod +x push_to_github.sh && ./push_to_github.sh", language='bash')
                 
-                loop.close()
-                
             except Exception as e:
                 st.error(f"An error occurred: {str(e)}")
                 st.exception(e)
@@ -1,19 +1,28 @@
 import asyncio
-import json
 import logging
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
-from dataclasses import dataclass
-import aiohttp
-from dapr.clients import DaprClient
-from dapr.ext.grpc import App
+import secrets
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
+import orjson
+from aiohttp import web
+from dapr.aio.clients import DaprClient
+from dapr.clients.grpc._state import Concurrency, Consistency, StateItem, StateOptions
+from dapr.proto import api_v1
+from grpc import StatusCode
+from grpc.aio import AioRpcError
+
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ChatMessage:
     """Represents a chat message in the multi-agent system."""
     agent_name: str
@@ -21,6 +30,14 @@ class ChatMessage:
     content: str
     timestamp: datetime
     message_id: str
+    _cached_bytes: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    
+    def to_bytes(self) -> bytes:
+        """Serialize the message to JSON, reusing the result on later calls."""
+        if self._cached_bytes is None:
+            # orjson skips the underscore-prefixed cache field
+            object.__setattr__(self, "_cached_bytes", orjson.dumps(self))
+        return self._cached_bytes
 
 class DaprChatManager:
     """Manages inter-agent communication using Dapr pub/sub."""
@@ -32,67 +49,337 @@ class DaprChatManager:
         self.client = None
         self.message_handlers = {}
         
+        # (agent_name, handler) pairs each sender's messages are routed to,
+        # rebuilt whenever an agent subscribes
+        self._recipients_by_sender: Dict[str, Tuple[Tuple[str, Callable], ...]] = {}
+        self._all_recipients: Tuple[Tuple[str, Callable], ...] = ()
+        
+        # Outgoing messages are coalesced into bulk publishes (see publish_messages)
+        self.max_pub_count = 64
+        self.max_pub_bytes = 1024 * 1024
+        self.flush_interval = 0.05
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._publish_queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._inflight = set()
+        self.publish_failures: Dict[str, Exception] = {}
+        self.max_publish_failures = 1000
+        
+        # Caps concurrent sidecar calls and, separately, handler invocations so
+        # handlers that publish never wait on permits held by other handlers
+        self.concurrency = int(os.environ.get("AGENT_CONCURRENCY", "4"))
+        if self.concurrency < 1:
+            raise ValueError(f"AGENT_CONCURRENCY must be at least 1, got {self.concurrency}")
+        self._sidecar_limit = asyncio.Semaphore(self.concurrency)
+        self._handler_limit = asyncio.Semaphore(self.concurrency)
+        
+        # Chat history is stored append-only, one key per message, with a
+        # bounded index of the most recent message keys
+        self.state_store_name = "chat-state"
+        self.history_index_key = "chat-history:index"
+        self.legacy_history_key = "chat-history"
+        self._legacy_history_checked = False
+        self.history_size = 1000
+        # Message items are immutable and may be re-sent after an index
+        # conflict, so only the index is guarded by its etag
+        self._message_options = StateOptions(
+            concurrency=Concurrency.last_write,
+            consistency=Consistency.eventual
+        )
+        self._index_options = StateOptions(
+            concurrency=Concurrency.first_write,
+            consistency=Consistency.eventual
+        )
+        
     async def initialize(self):
         """Initialize Dapr client."""
+        self._check_loop()
         try:
             self.client = DaprClient()
             logger.info("Dapr client initialized successfully")
         except Exception as e:
-            logger.error(f"Failed to initialize Dapr client: {e}")
+            logger.error("Failed to initialize Dapr client: %s", e)
             raise
     
+    async def _limited(self, semaphore: asyncio.Semaphore, awaitable):
+        """Await while holding a permit from one of the AGENT_CONCURRENCY limits."""
+        async with semaphore:
+            return await awaitable
+    
     async def publish_message(self, message: ChatMessage):
-        """Publish a message to the chat topic."""
+        """Queue a message for publishing to the chat topic.
+        
+        Messages are flushed in the background as a single bulk publish once
+        max_pub_count or max_pub_bytes is reached, or after flush_interval seconds.
+        """
+        self._ensure_flusher()
+        self._publish_queue.put_nowait((message.message_id, message.to_bytes()))
+    
+    async def publish_messages(self, messages: List[ChatMessage]) -> Dict[str, Exception]:
+        """Publish several messages to the chat topic with one bulk publish call.
+        
+        Returns the per-message failures keyed by message_id instead of raising.
+        """
+        return await self._publish_batch(
+            [(message.message_id, message.to_bytes()) for message in messages]
+        )
+    
+    async def _bulk_publish(self, batch: List[Tuple[str, bytes]]) -> Dict[str, str]:
+        """Send one bulk publish request, returning errors keyed by message_id.
+        
+        publish_events assigns random entry ids that it never returns, so the
+        request is built here with each message_id as its entry id, letting
+        failed entries be mapped back to their messages.
+        """
+        request = api_v1.BulkPublishRequest(
+            pubsub_name=self.pubsub_name,
+            topic=self.topic_name,
+            entries=[
+                api_v1.BulkPublishRequestEntry(
+                    entry_id=message_id,
+                    event=payload,
+                    content_type='application/json'
+                )
+                for message_id, payload in batch
+            ]
+        )
+        
+        try:
+            response = await self.client._stub.BulkPublishEvent(request)
+        except AioRpcError as e:
+            # Sidecars older than Dapr 1.12 only expose the alpha API
+            if e.code() != StatusCode.UNIMPLEMENTED:
+                raise
+            response = await self.client._stub.BulkPublishEventAlpha1(request)
+        
+        return {entry.entry_id: entry.error for entry in response.failedEntries}
+    
+    async def _publish_batch(self, batch: List[Tuple[str, bytes]]) -> Dict[str, Exception]:
+        """Publish already serialized (message_id, payload) pairs.
+        
+        The whole batch is confirmed by a single bulk publish acknowledgement.
+        Entries the sidecar rejects, or the whole batch if the bulk call
+        itself fails, are retried concurrently with single publishes.
+        Remaining failures are recorded in publish_failures.
+        """
+        failures: Dict[str, Exception] = {}
+        if not batch:
+            return failures
+        
         if not self.client:
             await self.initialize()
         
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Publishing %d messages (%d bytes)", len(batch), sum(len(payload) for _, payload in batch))
+        
         try:
-            message_data = {
-                "agent_name": message.agent_name,
-                "role": message.role,
-                "content": message.content,
-                "timestamp": message.timestamp.isoformat(),
-                "message_id": message.message_id
-            }
-            
-            await self.client.publish_event(
-                pubsub_name=self.pubsub_name,
-                topic_name=self.topic_name,
-                data=json.dumps(message_data),
-                data_content_type='application/json'
-            )
-            
-            logger.info(f"Message published from {message.agent_name}: {message.message_id}")
-            
+            errors = await self._limited(self._sidecar_limit, self._bulk_publish(batch))
+            retry = [(message_id, payload) for message_id, payload in batch if message_id in errors]
+            for message_id, _ in retry:
+                logger.error("Bulk publish rejected message %s: %s", message_id, errors[message_id])
         except Exception as e:
-            logger.error(f"Failed to publish message: {e}")
+            logger.error("Bulk publish failed, publishing individually: %s", e)
+            retry = batch
+        
+        if retry:
+            results = await asyncio.gather(*[
+                self._limited(self._sidecar_limit, self.client.publish_event(
+                    pubsub_name=self.pubsub_name,
+                    topic_name=self.topic_name,
+                    data=payload,
+                    data_content_type='application/json'
+                ))
+                for _, payload in retry
+            ], return_exceptions=True)
+            
+            for (message_id, _), result in zip(retry, results):
+                if isinstance(result, Exception):
+                    failures[message_id] = result
+        
+        for message_id, error in failures.items():
+            logger.error("Failed to publish message %s: %s", message_id, error)
+        self.publish_failures.update(failures)
+        
+        # Keep only the most recent failures
+        for message_id in list(self.publish_failures)[:-self.max_publish_failures]:
+            del self.publish_failures[message_id]
+        
+        logger.info("Published %d/%d messages", len(batch) - len(failures), len(batch))
+        return failures
+    
+    def pop_publish_failures(self) -> Dict[str, Exception]:
+        """Return and clear the recorded publish failures."""
+        failures, self.publish_failures = self.publish_failures, {}
+        return failures
+    
+    def _check_loop(self):
+        """Bind the manager to the running event loop on first use.
+        
+        The Dapr client's gRPC channel and the concurrency limits only work on
+        the loop they were created on, so any other loop is rejected.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        elif self._loop is not loop:
+            raise RuntimeError("DaprChatManager can only be used from the event loop it was first used on")
+    
+    def _ensure_flusher(self):
+        """Start the background flusher if it isn't running."""
+        self._check_loop()
+        if self._publish_queue is None:
+            self._publish_queue = asyncio.Queue()
+        if self._flusher is None:
+            self._flusher = self._loop.create_task(self._flush_loop(self._publish_queue))
+    
+    async def _flush_loop(self, queue: asyncio.Queue):
+        """Coalesce queued messages into bulk publishes."""
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await queue.get()]
+                batch_bytes = len(batch[0][1])
+                deadline = loop.time() + self.flush_interval
+                
+                while len(batch) < self.max_pub_count and batch_bytes < self.max_pub_bytes:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        entry = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    batch.append(entry)
+                    batch_bytes += len(entry[1])
+                
+                # Don't wait for the confirm before collecting the next batch
+                task = loop.create_task(self._publish_batch(batch))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                batch = []
+        except asyncio.CancelledError:
+            # Publish whatever was collected before shutdown
+            if batch:
+                await self._publish_batch(batch)
             raise
     
+    async def flush(self):
+        """Publish every queued message and wait for in-flight batches."""
+        self._check_loop()
+        if self._flusher is not None:
+            # A cancelled flusher publishes the batch it was collecting
+            flusher, self._flusher = self._flusher, None
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+        
+        batch = []
+        while self._publish_queue is not None and not self._publish_queue.empty():
+            batch.append(self._publish_queue.get_nowait())
+        
+        await asyncio.gather(*[
+            self._publish_batch(batch[start:start + self.max_pub_count])
+            for start in range(0, len(batch), self.max_pub_count)
+        ])
+        
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+    
     async def subscribe_to_messages(self, agent_name: str, handler_func):
         """Subscribe to messages for a specific agent."""
         self.message_handlers[agent_name] = handler_func
-        logger.info(f"Subscribed {agent_name} to messages")
+        
+        # Don't send to sender
+        self._all_recipients = tuple(self.message_handlers.items())
+        self._recipients_by_sender = {
+            sender: tuple(recipient for recipient in self._all_recipients if recipient[0] != sender)
+            for sender in self.message_handlers
+        }
+        logger.info("Subscribed %s to messages", agent_name)
     
-    async def handle_incoming_message(self, event_data: Dict):
-        """Handle incoming messages from Dapr subscription."""
-        try:
-            message_data = json.loads(event_data.get('data', '{}'))
-            
-            message = ChatMessage(
-                agent_name=message_data['agent_name'],
-                role=message_data['role'],
-                content=message_data['content'],
-                timestamp=datetime.fromisoformat(message_data['timestamp']),
-                message_id=message_data['message_id']
-            )
+    def _parse_message(self, event_data: Union[Dict, bytes, str]) -> ChatMessage:
+        """Build a ChatMessage from a CloudEvent; a raw JSON body is decoded here."""
+        if isinstance(event_data, (bytes, str)):
+            event_data = orjson.loads(event_data)
+        
+        # JSON payloads arrive already decoded inside the CloudEvent
+        message_data = event_data.get('data', {})
+        if isinstance(message_data, (bytes, str)):
+            message_data = orjson.loads(message_data)
+        
+        return self._message_from_data(message_data)
+    
+    def _message_from_data(self, message_data: Dict) -> ChatMessage:
+        """Build a ChatMessage from its decoded JSON fields."""
+        return ChatMessage(
+            agent_name=message_data['agent_name'],
+            role=message_data['role'],
+            content=message_data['content'],
+            timestamp=datetime.fromisoformat(message_data['timestamp']),
+            message_id=message_data['message_id']
+        )
+    
+    async def handle_incoming_message(self, event_data: Union[Dict, bytes, str]):
+        """Handle incoming messages from Dapr subscription.
+        
+        event_data is the decoded CloudEvent; a raw JSON body is decoded here.
+        """
+        await self.handle_incoming_messages([event_data])
+    
+    async def handle_incoming_messages(self, events: List[Union[Dict, bytes, str]]) -> List[bool]:
+        """Handle a batch of incoming messages from a Dapr bulk subscription.
+        
+        Every subscriber receives its messages in order, while all subscribers
+        are served concurrently with a single gather. Returns whether each
+        event could be parsed.
+        """
+        parsed = []
+        deliveries: Dict[str, Tuple[Callable, List[ChatMessage]]] = {}
+        
+        for event_data in events:
+            try:
+                message = self._parse_message(event_data)
+            except Exception as e:
+                logger.error("Failed to handle incoming message: %s", e)
+                parsed.append(False)
+                continue
             
-            # Route message to appropriate handlers
-            for agent_name, handler in self.message_handlers.items():
-                if agent_name != message.agent_name:  # Don't send to sender
-                    await handler(message)
-                    
-        except Exception as e:
-            logger.error(f"Failed to handle incoming message: {e}")
+            parsed.append(True)
+            for agent_name, handler in self._recipients_by_sender.get(message.agent_name, self._all_recipients):
+                deliveries.setdefault(agent_name, (handler, []))[1].append(message)
+        
+        await asyncio.gather(*[
+            self._deliver(agent_name, handler, messages)
+            for agent_name, (handler, messages) in deliveries.items()
+        ])
+        
+        return parsed
+    
+    async def _deliver(self, agent_name: str, handler: Callable, messages: List[ChatMessage]):
+        """Deliver messages to one subscriber in order, logging failures."""
+        for message in messages:
+            try:
+                await self._limited(self._handler_limit, handler(message))
+            except Exception as e:
+                logger.error("Handler for %s failed on message %s: %s", agent_name, message.message_id, e)
+    
+    def _history_key(self, message: ChatMessage) -> str:
+        """State key a message is stored under.
+        
+        The timestamp is normalized to UTC (naive values are read as local
+        time) and formatted at a fixed width, so keys sort chronologically.
+        """
+        timestamp = message.timestamp.astimezone(timezone.utc)
+        return f"chat-history:{timestamp.strftime('%Y-%m-%dT%H:%M:%S.%fZ')}:{message.message_id}"
+    
+    async def _get_history_index(self) -> Tuple[List[str], Optional[str]]:
+        """Load the chat history index and its etag."""
+        response = await self.client.get_state(
+            store_name=self.state_store_name,
+            key=self.history_index_key
+        )
+        index = orjson.loads(response.data) if response.data else []
+        return index, response.etag or None
     
     async def get_chat_history(self, limit: int = 100) -> List[ChatMessage]:
         """Retrieve chat history from Dapr state store."""
@@ -100,100 +387,224 @@ class DaprChatManager:
             await self.initialize()
         
         try:
-            # Get from state store
-            response = await self.client.get_state(
-                store_name="chat-state",
-                key="chat-history"
+            await self._migrate_legacy_history()
+            index, _ = await self._get_history_index()
+            keys = index[-limit:]
+            if not keys:
+                return []
+            
+            # Fetch all messages in one round-trip; the sidecar reads them in parallel
+            response = await self.client.get_bulk_state(
+                store_name=self.state_store_name,
+                keys=keys,
+                parallelism=min(len(keys), 10)
             )
+            data_by_key = {item.key: item.data for item in response.items if item.data}
             
-            if response.data:
-                history_data = json.loads(response.data)
-                messages = []
-                
-                for msg_data in history_data[-limit:]:
-                    message = ChatMessage(
-                        agent_name=msg_data['agent_name'],
-                        role=msg_data['role'],
-                        content=msg_data['content'],
-                        timestamp=datetime.fromisoformat(msg_data['timestamp']),
-                        message_id=msg_data['message_id']
-                    )
-                    messages.append(message)
+            messages = []
+            for key in keys:
+                if key not in data_by_key:
+                    continue
                 
-                return messages
+                messages.append(self._message_from_data(orjson.loads(data_by_key[key])))
+            
+            return messages
             
         except Exception as e:
-            logger.error(f"Failed to get chat history: {e}")
+            logger.error("Failed to get chat history: %s", e)
         
         return []
     
-    async def save_chat_history(self, messages: List[ChatMessage]):
-        """Save chat history to Dapr state store."""
+    async def _migrate_legacy_history(self):
+        """Move history saved as a single chat-history blob to per-message keys."""
+        if self._legacy_history_checked:
+            return
+        
+        response = await self.client.get_state(
+            store_name=self.state_store_name,
+            key=self.legacy_history_key
+        )
+        if response.data:
+            messages = [self._message_from_data(msg_data) for msg_data in orjson.loads(response.data)]
+            if not await self._save_history(messages):
+                raise RuntimeError("Failed to migrate legacy chat history")
+            
+            await self.client.delete_state(store_name=self.state_store_name, key=self.legacy_history_key)
+            logger.info("Migrated %d messages from legacy chat history", len(messages))
+        
+        self._legacy_history_checked = True
+    
+    async def save_chat_history(self, messages: List[ChatMessage], retries: int = 3):
+        """Save chat history to Dapr state store.
+        
+        Only messages not yet in the history index are written, so saving an
+        unchanged history makes no write at all. The index is updated with
+        first-write-wins concurrency and retried on conflict; the chat log
+        only needs eventual consistency.
+        """
         if not self.client:
             await self.initialize()
         
         try:
-            history_data = []
-            for msg in messages:
-                history_data.append({
-                    "agent_name": msg.agent_name,
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp.isoformat(),
-                    "message_id": msg.message_id
-                })
-            
-            await self.client.save_state(
-                store_name="chat-state",
-                key="chat-history",
-                value=json.dumps(history_data)
-            )
-            
-            logger.info(f"Saved {len(messages)} messages to chat history")
-            
+            await self._migrate_legacy_history()
         except Exception as e:
-            logger.error(f"Failed to save chat history: {e}")
+            logger.error("Failed to migrate legacy chat history: %s", e)
+            return
+        
+        await self._save_history(messages, retries)
+    
+    async def _save_history(self, messages: List[ChatMessage], retries: int = 3) -> bool:
+        """Write messages missing from the history index; returns whether it succeeded."""
+        # Anything older than the newest history_size messages can't be indexed
+        messages = messages[-self.history_size:]
+        
+        for attempt in range(1, retries + 1):
+            try:
+                index, etag = await self._get_history_index()
+                known = set(index)
+                new_messages = {}
+                for msg in messages:
+                    key = self._history_key(msg)
+                    if key not in known:
+                        new_messages[key] = msg
+                
+                # Keys start with the fixed-width UTC timestamp, so sorting keeps
+                # the index chronological and evicts the oldest messages first
+                index = sorted(known.union(new_messages))
+                evicted, index = index[:-self.history_size], index[-self.history_size:]
+                
+                # Messages that would be evicted straight away are not written
+                kept = set(index)
+                new_messages = {key: msg for key, msg in new_messages.items() if key in kept}
+                if not new_messages:
+                    return True
+                
+                # Write the new messages and the index in a single bulk request
+                states = [
+                    StateItem(key=key, value=msg.to_bytes(), options=self._message_options)
+                    for key, msg in new_messages.items()
+                ]
+                states.append(StateItem(
+                    key=self.history_index_key,
+                    value=orjson.dumps(index),
+                    etag=etag,
+                    options=self._index_options
+                ))
+                
+                await self.client.save_bulk_state(
+                    store_name=self.state_store_name,
+                    states=states
+                )
+                
+                # Messages that fell out of the index are no longer reachable
+                await asyncio.gather(*[
+                    self.client.delete_state(store_name=self.state_store_name, key=key)
+                    for key in evicted
+                    if key in known
+                ], return_exceptions=True)
+                
+                logger.info("Saved %d messages to chat history", len(new_messages))
+                return True
+                
+            except Exception as e:
+                logger.error("Failed to save chat history (attempt %d/%d): %s", attempt, retries, e)
+        
+        return False
     
     async def cleanup(self):
         """Cleanup Dapr resources."""
+        await self.flush()
+        
         if self.client:
             await self.client.close()
             logger.info("Dapr client closed")
 
-# Dapr App for handling subscriptions
-app = App()
+# Dapr delivers subscribed events to this app over HTTP
+async def subscriptions(request: web.Request) -> web.Response:
+    """Tell the Dapr sidecar which topics to deliver to this app."""
+    return web.json_response([{
+        "pubsubname": "chat-pubsub",
+        "topic": "agent-messages",
+        "route": "/agent-messages",
+        "bulkSubscribe": {
+            "enabled": True,
+            "maxMessagesCount": 64,
+            "maxAwaitDurationMs": 100
+        }
+    }])
+
+async def message_handler(request: web.Request) -> web.Response:
+    """Handle a batch of incoming messages from Dapr bulk subscription."""
+    body = orjson.loads(await request.read())
+    chat_manager = await create_chat_manager()
+    
+    # Sidecars without bulk subscribe support deliver one plain CloudEvent
+    if 'entries' not in body:
+        [ok] = await chat_manager.handle_incoming_messages([body])
+        return web.json_response({"status": "SUCCESS" if ok else "DROP"})
+    
+    entries = body['entries']
+    parsed = await chat_manager.handle_incoming_messages([entry.get('event', {}) for entry in entries])
+    
+    # Unparseable events will never succeed, so don't have Dapr redeliver them
+    return web.json_response({"statuses": [
+        {"entryId": entry['entryId'], "status": "SUCCESS" if ok else "DROP"}
+        for entry, ok in zip(entries, parsed)
+    ]})
+
+async def on_cleanup(app: web.Application):
+    """Flush the shared manager before the server cancels its remaining tasks."""
+    await close_chat_manager()
 
-@app.subscribe(pubsub_name='chat-pubsub', topic='agent-messages')
-async def message_handler(event):
-    """Handle incoming messages from Dapr subscription."""
-    chat_manager = DaprChatManager()
-    await chat_manager.handle_incoming_message(event.data)
+app = web.Application()
+app.router.add_get('/dapr/subscribe', subscriptions)
+app.router.add_post('/agent-messages', message_handler)
+app.on_cleanup.append(on_cleanup)
+
+# Shared manager so the Dapr client and its gRPC channel are reused across messages
+_manager: Optional[DaprChatManager] = None
+_manager_lock = asyncio.Lock()
 
 # Utility functions
 async def create_chat_manager() -> DaprChatManager:
-    """Factory function to create and initialize chat manager."""
-    manager = DaprChatManager()
-    await manager.initialize()
-    return manager
+    """Return the shared chat manager, initializing it on first use."""
+    global _manager
+    if _manager is None:
+        async with _manager_lock:
+            if _manager is None:
+                manager = DaprChatManager()
+                await manager.initialize()
+                _manager = manager
+    return _manager
+
+async def close_chat_manager():
+    """Flush queued messages and close the shared Dapr client.
+    
+    Must run on the event loop the shared manager was used from.
+    """
+    global _manager
+    if _manager is not None:
+        manager, _manager = _manager, None
+        await manager.cleanup()
 
 async def send_agent_message(agent_name: str, role: str, content: str) -> str:
     """Send a message from an agent."""
-    import uuid
-    
     message = ChatMessage(
         agent_name=agent_name,
         role=role,
         content=content,
-        timestamp=datetime.now(),
-        message_id=str(uuid.uuid4())
+        timestamp=datetime.now(timezone.utc),
+        message_id=secrets.token_hex(16)
     )
     
     manager = await create_chat_manager()
     await manager.publish_message(message)
-    await manager.cleanup()
     
     return message.message_id
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    
     # Run the Dapr app
-    app.run(port=6001)
\ No newline at end of file
+    web.run_app(app, port=6001)
@@ -0,0 +1,146 @@
+import logging
+import mmap
+import os
+import pickle
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+from openai import AsyncAzureOpenAI
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CachedMessage:
+    """Snapshot of a conversation message, kept for display only."""
+    role: str
+    name: Optional[str]
+    content: str
+
+@dataclass
+class CachedResponse:
+    """Result of a previous agent run."""
+    history: List[CachedMessage]
+    html: Optional[str]
+
+class ResponseCache:
+    """Caches agent pipeline results by semantic similarity of the prompt.
+    
+    Prompts are embedded with the Azure OpenAI deployment named by
+    AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME; the cache is disabled when it is
+    not set. Entries are persisted to disk so they survive app restarts.
+    """
+    
+    def __init__(self, path: str = ".response_cache.pkl", threshold: float = 0.95, max_entries: int = 256):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.deployment = os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME")
+        self.client = None
+        self.embeddings: Optional[np.ndarray] = None
+        self.responses: List[CachedResponse] = []
+        self._load()
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether an embedding deployment is configured."""
+        return bool(self.deployment)
+    
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        """Return the normalized embedding of text, or None if unavailable."""
+        if not self.enabled:
+            return None
+        
+        try:
+            if self.client is None:
+                self.client = AsyncAzureOpenAI(
+                    api_key=os.environ["AZURE_OPENAI_API_KEY"],
+                    azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+                    api_version=os.environ.get("AZURE_OPENAI_API_VERSION", "2024-02-01")
+                )
+            
+            response = await self.client.embeddings.create(model=self.deployment, input=text)
+            embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+            return embedding / np.linalg.norm(embedding)
+        
+        except Exception as e:
+            logger.error("Failed to embed prompt for response cache: %s", e)
+            return None
+    
+    def lookup(self, embedding: Optional[np.ndarray]) -> Optional[CachedResponse]:
+        """Return the cached response most similar to embedding, if close enough."""
+        if embedding is None:
+            return None
+        
+        self._discard_mismatched(embedding)
+        if self.embeddings is None:
+            return None
+        
+        # Embeddings are normalized, so the dot product is the cosine similarity
+        scores = self.embeddings @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        
+        logger.info("Response cache hit (similarity %.3f)", scores[best])
+        return self.responses[best]
+    
+    def add(self, embedding: Optional[np.ndarray], history: List, html: Optional[str]):
+        """Cache the result of an agent run and persist the cache."""
+        if embedding is None:
+            return
+        
+        response = CachedResponse(
+            history=[
+                CachedMessage(role=str(message.role), name=message.name, content=str(message.content))
+                for message in history
+            ],
+            html=html
+        )
+        
+        self._discard_mismatched(embedding)
+        if self.embeddings is None:
+            self.embeddings = embedding[np.newaxis, :]
+        else:
+            self.embeddings = np.vstack([self.embeddings, embedding])[-self.max_entries:]
+        self.responses = (self.responses + [response])[-self.max_entries:]
+        
+        self._save()
+    
+    def _discard_mismatched(self, embedding: np.ndarray):
+        """Drop cached entries embedded with a different vector size.
+        
+        This happens when the embedding deployment changes; those entries can
+        never be compared with new prompts.
+        """
+        if self.embeddings is not None and self.embeddings.shape[1] != embedding.shape[0]:
+            logger.info(
+                "Discarding %d cached responses with embedding size %d (now %d)",
+                len(self.responses), self.embeddings.shape[1], embedding.shape[0]
+            )
+            self.embeddings = None
+            self.responses = []
+    
+    def _load(self):
+        """Load persisted entries, memory-mapping the cache file."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        
+        try:
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                data = pickle.loads(mm)
+            self.embeddings = data["embeddings"]
+            self.responses = data["responses"]
+            logger.info("Loaded %d cached responses", len(self.responses))
+        except Exception as e:
+            logger.error("Failed to load response cache: %s", e)
+    
+    def _save(self):
+        """Persist entries, replacing the cache file atomically."""
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({"embeddings": self.embeddings, "responses": self.responses}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error("Failed to save response cache: %s", e)